@@ -1,6 +1,6 @@
 #!/bin/bash
 #Helper program for extracting valid records and importing them them to mongo
-set -o errexit -o nounset
+set -o errexit -o nounset -o pipefail
 
 if [ $# != 1 ]; then
     echo Extract valid OADOI records and import them into the oadoi Mongo database
@@ -10,4 +10,5 @@ fi
 
 echo Processing $1
 
-zcat $1 | sed -e 's#^\\N$##' | sed -s 's#\\\\"#\\"#'g | jq -R 'fromjson? | .' | mongoimport --db oadoi --collection all_oadoi --mode upsert --upsertFields doi
+zcat $1 | sed -e 's#^\\N$##' -e 's#\\\\"#\\"#g' | jq -R 'fromjson? | .' | mongoimport --db oadoi --collection all_oadoi --mode upsert --upsertFields doi \
+    --numInsertionWorkers=$(nproc)
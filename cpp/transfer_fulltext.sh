@@ -20,46 +20,28 @@ remote_top_dir=$1
 shift
 date_dir=$(date +%y%m%d)
 dirs_to_transfer=$@
-
-#Use a trick to see whether the date directory already exists
-#(https://superuser.com/questions/850158/how-to-check-if-file-exists-in-remote-windows-from-local-linux-script) (180704)
-#Create the directory if it doesn't
-function CreateDirIfNotExists {
-    remote_top_dir=$1
-    dir_to_test=$2
-    # Needed since otherwise we would be aborted because of our test
-    set +o errexit
-    echo "df ${dir_to_test}" | sftp -b - -oIdentityFile=${keyfile_path} ${username}@${server}:${remote_top_dir}
-    if [ $? -ne 0 ]; then
-        sftp -oIdentityFile=${keyfile_path} ${username}@${server}:${remote_top_dir} <<-EOF
-	mkdir ${dir_to_test}
-	EOF
-    echo "Created directory ${dir_to_test}"
-    else
-         echo "Directory ${dir_to_test} already present"
-    fi
-    set -o errexit
-}
-
-
-function TransferDirectory {
+# Larger and more outstanding SFTP requests than sftp's defaults of 32 KiB and 64, so that
+# uploads are not throttled to buffer_size * num_requests per round trip on high-latency links.
+sftp_buffer_size=131072
+sftp_num_requests=128
+
+# Uploads all the directories that contain 7z files within a single SFTP session.  The date directory
+# is created first, a failure to do so, e.g. because it already exists, is ignored.
+function TransferDirectories {
     local_top_dir=$1
-    remote_top_dir=$2
-    dir_to_transfer=$3
-    sftp -oIdentityFile=${keyfile_path} ${username}@${server} <<-EOF
-	lcd ${local_top_dir}
-	cd ${remote_top_dir}
-	cd ${date_dir}
-	put -r -p  ${dir_to_transfer}
-	EOF
+    shift
+    remote_top_dir=$1
+    shift
+    {
+        echo "lcd ${local_top_dir}"
+        echo "cd ${remote_top_dir}"
+        echo "-mkdir ${date_dir}"
+        echo "cd ${date_dir}"
+        for dir_to_transfer in "$@"; do
+            echo "put -r -p ${dir_to_transfer}"
+        done
+    } | sftp -b - -B ${sftp_buffer_size} -R ${sftp_num_requests} -oIdentityFile=${keyfile_path} ${username}@${server}
 }
 
 
-# Create the top level directories
-CreateDirIfNotExists "${remote_top_dir}" "${date_dir}"
-
-# Upload all the directories that contain 7z files
-for dir_to_transfer in $dirs_to_transfer
-do
-    TransferDirectory ${local_top_dir} ${remote_top_dir} ${dir_to_transfer}
-done
+TransferDirectories ${local_top_dir} ${remote_top_dir} ${dirs_to_transfer}
@@ -1,20 +1,26 @@
 # Python 3 module
 # -*- coding: utf-8 -*-
 from ftplib import FTP
+import ftplib
 import os
+import socket
+import time
 import util
 
 
+# Used instead of ftplib's default of 8 KiB to cut down on syscalls for large uploads.
+TRANSFER_BLOCK_SIZE = 1024 * 1024
+MAX_UPLOAD_ATTEMPTS = 5
+
+
 class FTPConnection:
-    _host = ""
-    _username = ""
-    _password = ""
-    _ftp = None
+    __slots__ = ("_host", "_username", "_password", "_ftp")
 
     def __init__(self, host, username, password):
         self._host = host
         self._username = username
         self._password = password
+        self._ftp = None
         self._connect()
         self._login()
 
@@ -66,18 +72,88 @@ class FTPConnection:
             util.Error("File download failed! (" + str(e) + ")")
 
 
+    def _getRemoteFileSize(self, remote_file_name):
+        try:
+            self._ftp.voidcmd("TYPE I")
+            size = self._ftp.size(remote_file_name)
+            return size if size is not None else 0
+        except ftplib.error_perm: # Most likely the file does not exist yet.
+            return 0
+
+
+    # Unlike _connect() and _login() this raises on errors, so that uploadFile() can count them as failed attempts.
+    def _reconnect(self, remote_dir_path):
+        try:
+            self._ftp.close()
+        except Exception:
+            pass
+        self._ftp = FTP(host=self._host, timeout=120)
+        self._ftp.login(user=self._username, passwd=self._password)
+        self._ftp.cwd(remote_dir_path)
+
+
+    # Like ftplib.FTP.storbinary() except that "on_stor_accepted" is called as soon as the server has accepted the
+    # STOR command, i.e. once "remote_file_name" has been created or truncated or, if "offset" is non-zero, is being
+    # appended to.
+    def _storeFile(self, fp, remote_file_name, offset, on_stor_accepted):
+        fp.seek(offset)
+        self._ftp.voidcmd("TYPE I")
+        with self._ftp.transfercmd("STOR " + remote_file_name, offset if offset > 0 else None) as conn:
+            on_stor_accepted()
+            while True:
+                block = fp.read(TRANSFER_BLOCK_SIZE)
+                if not block:
+                    break
+                conn.sendall(block)
+        return self._ftp.voidresp()
+
+
+    # If an attempt fails with a transient error we reconnect and resume the upload at the
+    # offset the server already has, using REST, instead of starting over.
     def uploadFile(self, local_file_path, remote_file_name=None):
         if remote_file_name is None:
             remote_file_name = os.path.basename(local_file_path)
         error_message = "failed to upload file " + local_file_path + " to " + remote_file_name
         try:
-            with open(local_file_path, 'rb') as fp:
-                res = self._ftp.storbinary("STOR " + remote_file_name, fp)
-                if not res.startswith('226 '):
-                    util.Error(error_message)
+            local_size = os.path.getsize(local_file_path)
+            remote_dir_path = self._ftp.pwd()
         except Exception as e:
             util.Error(error_message + " (" + str(e) + ")")
 
+        # N.B. until the server has accepted one of our STOR commands "remote_file_name" may be a leftover from an
+        # earlier run, so we must not resume uploading to it.
+        stor_accepted = False
+        def OnStorAccepted():
+            nonlocal stor_accepted
+            stor_accepted = True
+
+        for attempt in range(MAX_UPLOAD_ATTEMPTS):
+            try:
+                if attempt > 0:
+                    self._reconnect(remote_dir_path)
+                offset = self._getRemoteFileSize(remote_file_name) if stor_accepted else 0
+                if offset >= local_size:
+                    offset = 0
+                with open(local_file_path, 'rb') as fp:
+                    try:
+                        res = self._storeFile(fp, remote_file_name, offset, OnStorAccepted)
+                    except ftplib.error_perm as e:
+                        if offset == 0:
+                            raise
+                        util.Warning(error_message + " at offset " + str(offset) + ", uploading the whole file ("
+                                     + str(e) + ")")
+                        res = self._storeFile(fp, remote_file_name, 0, OnStorAccepted)
+                if not res.startswith('226 '):
+                    util.Error(error_message)
+                return
+            except (ftplib.error_temp, socket.timeout, EOFError, ConnectionError) as e:
+                if attempt == MAX_UPLOAD_ATTEMPTS - 1:
+                    util.Error(error_message + " (" + str(e) + ")")
+                util.Warning(error_message + ", retrying (" + str(e) + ")")
+                time.sleep(2 ** attempt)
+            except Exception as e:
+                util.Error(error_message + " (" + str(e) + ")")
+
 
     def renameFile(self, remote_file_name_old, remote_file_name_new):
         error_message = "failed to rename file " + remote_file_name_old + " to " + remote_file_name_new
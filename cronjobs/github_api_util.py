@@ -1,22 +1,142 @@
 # Python 3 module
 # -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import parse_qs, urlparse
+from urllib3.util.retry import Retry
+import functools
+import hashlib
+import json
 import os
 import re
 import requests
 import util
 
 
+GITHUB_API_TIMEOUT = (10, 60) # (connect, read) in seconds
+MAX_CONCURRENT_REQUESTS = 8
+GITHUB_GRAPHQL_URL = 'https://api.github.com/graphql'
+MAX_MUTATIONS_PER_REQUEST = 20
+MAX_CONCURRENT_UPDATES = 4
+ISSUES_CACHE_DIRECTORY = '/usr/local/tmp/zjs'
+
+
+def _CreateSession(retries):
+    session = requests.Session()
+    session.headers.update({ 'Accept' : 'application/vnd.github+json' })
+    session.mount("https://", HTTPAdapter(pool_maxsize=MAX_CONCURRENT_REQUESTS, max_retries=retries))
+    return session
+
+
+# @return A session shared by all idempotent GitHub API calls that keeps the connection to api.github.com alive and
+#         retries failed and rate-limited requests with exponential backoff, honouring "Retry-After" headers.
+# @note   The POST requests sent over this session, i.e. GraphQL queries and label/body updates, may safely be
+#         repeated.  Use GetSessionForNonIdempotentRequests() for anything else.
+@functools.lru_cache(maxsize=1)
+def GetSession():
+    return _CreateSession(Retry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                                allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | { "POST" },
+                                respect_retry_after_header=True))
+
+
+# Only retries requests that GitHub has certainly not processed, i.e. failed connection attempts and requests that
+# were rejected due to rate limiting.
+class _NonIdempotentRequestRetry(Retry):
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if status_code == 429:
+            return bool(self.total)
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+# @return A session for requests like issue creation that must not be sent twice.  N.B. a read timeout or a 5xx
+#         status may be reported after GitHub has already carried out the request.
+@functools.lru_cache(maxsize=1)
+def GetSessionForNonIdempotentRequests():
+    return _CreateSession(_NonIdempotentRequestRetry(total=5, read=0, backoff_factor=1, status_forcelist=[429],
+                                                     allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                                                     respect_retry_after_header=True))
+
+
+# Conditional requests on unchanged pages are answered with "304 Not Modified" which costs neither bandwidth nor, for
+# authenticated requests, rate-limit budget.  The cache is best effort, i.e. we just fetch everything if it is
+# missing, unreadable or can't be written.
+
+
+# @return The headers needed to authenticate with the token from the environment, if any.
+def _GetAuthorizationHeaders():
+    github_oauth_token = os.environ.get('GITHUB_OAUTH_TOKEN')
+    return { 'Authorization' : 'token ' + github_oauth_token } if github_oauth_token else {}
+
+
+# What a request returns depends on who sends it, so there is a cache per repository and token.  N.B. the file name
+# only contains a hash of the token.
+def _GetIssuesCachePath(repository):
+    github_oauth_token = os.environ.get('GITHUB_OAUTH_TOKEN')
+    token_hash = hashlib.sha256(github_oauth_token.encode()).hexdigest()[:16] if github_oauth_token else 'anonymous'
+    return os.path.join(ISSUES_CACHE_DIRECTORY, repository + '-' + token_hash + '.json')
+
+
+def _LoadIssuesCache(repository):
+    try:
+        with open(_GetIssuesCachePath(repository), 'r') as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+
+# N.B. the cache is only readable by us since the token may give access to private issues.
+def _SaveIssuesCache(repository, cache):
+    cache_path = _GetIssuesCachePath(repository)
+    temp_cache_path = cache_path + '.tmp'
+    try:
+        os.makedirs(ISSUES_CACHE_DIRECTORY, exist_ok=True)
+        with open(os.open(temp_cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(temp_cache_path, cache_path)
+    except OSError as e:
+        util.Warning('failed to write "' + cache_path + '": ' + str(e))
+
+
+# @return A dict with the issues on the page at "url" as "results", the number of the last page as "last_page" and
+#         the page's "etag", either freshly retrieved or, if the page is unchanged, taken from "old_cache".
+def _GetIssuesPage(session, url, old_cache, new_cache):
+    cached_page = old_cache.get(url)
+    headers = _GetAuthorizationHeaders()
+    if cached_page is not None:
+        headers['If-None-Match'] = cached_page['etag']
+    req = session.get(url, headers=headers, timeout=GITHUB_API_TIMEOUT)
+    if req.status_code == 304 and cached_page is not None:
+        new_cache[url] = cached_page
+        return cached_page
+    req.raise_for_status()
+    page = { 'results' : req.json(), 'last_page' : None, 'etag' : req.headers.get('ETag') }
+    if "last" in req.links:
+        page['last_page'] = int(parse_qs(urlparse(req.links['last']['url']).query)['page'][0])
+    if page['etag'] is not None:
+        new_cache[url] = page
+    return page
+
+
+# Once the first page tells us how many pages there are, the remaining pages are fetched concurrently.
 def GetAllIssuesForUBTueRepository(repository):
-    results = []
-    req = requests.get('https://api.github.com/repos/ubtue/' + repository + '/issues?state=all&per_page=100')
-    for result in req.json():
-        results.append(result)
-    while "next" in req.links:
-        next_url =  req.links['next']['url'];
-        req = requests.get(next_url)
-        for result in req.json():
-            results.append(result)
-    return results
+    session = GetSession()
+    url = 'https://api.github.com/repos/ubtue/' + repository + '/issues?state=all&per_page=100'
+    old_cache = _LoadIssuesCache(repository)
+    new_cache = {}
+    first_page = _GetIssuesPage(session, url, old_cache, new_cache)
+    results = list(first_page['results'])
+    if first_page['last_page'] is not None:
+        page_urls = [ url + '&page=' + str(page) for page in range(2, first_page['last_page'] + 1) ]
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+            for page in executor.map(lambda page_url: _GetIssuesPage(session, page_url, old_cache, new_cache), page_urls):
+                results.extend(page['results'])
+    _SaveIssuesCache(repository, new_cache)
+
+    # Issues may move between pages while we are fetching them:
+    unique_results = {}
+    for result in results:
+        unique_results.setdefault(result['id'], result)
+    return list(unique_results.values())
 
 
 def UpdateIssueInRepository(repository, issue_number, data):
@@ -25,11 +145,89 @@ def UpdateIssueInRepository(repository, issue_number, data):
     github_oauth_token = os.environ.get('GITHUB_OAUTH_TOKEN')
     headers = { 'Authorization' :  'token ' + github_oauth_token }
     url = 'https://api.github.com/repos/ubtue/' + repository + '/issues/' + issue_number
-    req = requests.post(url, json=data, headers=headers)
+    req = GetSession().post(url, json=data, headers=headers, timeout=GITHUB_API_TIMEOUT)
     req.raise_for_status()
     print(req.text)
 
 
+def _PostGraphQLQuery(query, variables):
+    if not 'GITHUB_OAUTH_TOKEN' in os.environ:
+       raise Exception('GITHUB_OAUTH_TOKEN must be set. Export it from the shell')
+    headers = { 'Authorization' :  'token ' + os.environ.get('GITHUB_OAUTH_TOKEN') }
+    req = GetSession().post(GITHUB_GRAPHQL_URL, json={ 'query' : query, 'variables' : variables }, headers=headers,
+                            timeout=GITHUB_API_TIMEOUT)
+    req.raise_for_status()
+    result = req.json()
+    if result.get('errors'):
+        raise Exception('GraphQL request failed: ' + str(result['errors']))
+    return result['data']
+
+
+# @return A dict that maps the names of all labels of "repository" to their GraphQL node IDs.
+def GetLabelIdsForUBTueRepository(repository):
+    query = '''query($repository: String!, $cursor: String) {
+                 repository(owner: "ubtue", name: $repository) {
+                   labels(first: 100, after: $cursor) { pageInfo { hasNextPage endCursor } nodes { id name } }
+                 }
+               }'''
+    label_ids = {}
+    cursor = None
+    while True:
+        labels = _PostGraphQLQuery(query, { 'repository' : repository, 'cursor' : cursor })['repository']['labels']
+        for label in labels['nodes']:
+            label_ids[label['name']] = label['id']
+        if not labels['pageInfo']['hasNextPage']:
+            return label_ids
+        cursor = labels['pageInfo']['endCursor']
+
+
+# @brief Applies many issue updates with a few GraphQL requests instead of one REST request per issue.
+# @param updates  A list of (issue, data) pairs where "issue" is an issue as returned by
+#                 GetAllIssuesForUBTueRepository() and "data" is what UpdateIssueInRepository() would be passed, i.e.
+#                 a "labels" list and optionally a "body".  Of several updates to the same issue only the last one
+#                 will be applied.  The applied changes are also stored in the "issue" dicts so that callers can
+#                 keep working with them without having to retrieve the issues again.
+# @note   Updates that refer to labels which don't exist yet are sent via UpdateIssueInRepository() since only the
+#         REST API creates missing labels on the fly.
+def BatchUpdateIssuesInRepository(repository, updates):
+    last_update_per_issue = {}
+    for issue, data in updates:
+        last_update_per_issue[issue['number']] = (issue, data)
+    if not last_update_per_issue:
+        return
+
+    label_ids = GetLabelIdsForUBTueRepository(repository)
+    update_inputs = []
+    rest_updates = []
+    for issue, data in last_update_per_issue.values():
+        if not all(label in label_ids for label in data['labels']):
+            rest_updates.append((str(issue['number']), data))
+            continue
+        update_input = { 'id' : issue['node_id'], 'labelIds' : [ label_ids[label] for label in data['labels'] ] }
+        if 'body' in data:
+            update_input['body'] = data['body']
+        update_inputs.append(update_input)
+
+    for batch_start in range(0, len(update_inputs), MAX_MUTATIONS_PER_REQUEST):
+        batch = update_inputs[batch_start:batch_start + MAX_MUTATIONS_PER_REQUEST]
+        aliases = [ 'u' + str(i) for i in range(len(batch)) ]
+        query = 'mutation(' + ', '.join('$' + alias + ': UpdateIssueInput!' for alias in aliases) + ') { ' \
+                + ' '.join(alias + ': updateIssue(input: $' + alias + ') { issue { number } }' for alias in aliases) + ' }'
+        result = _PostGraphQLQuery(query, dict(zip(aliases, batch)))
+        print('Updated issues ' + ', '.join(str(result[alias]['issue']['number']) for alias in aliases))
+
+    # The mutations above are sent one request at a time since GitHub's secondary rate limits penalise concurrent
+    # content-creating requests, but the REST fallbacks are independent and few enough to overlap.
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_UPDATES) as executor:
+        list(executor.map(lambda update: UpdateIssueInRepository(repository, *update), rest_updates))
+
+    for issue, data in last_update_per_issue.values():
+        issue['labels'] = [ { 'name' : label } for label in data['labels'] ]
+        if 'body' in data:
+            issue['body'] = data['body']
+
+
+@functools.lru_cache(maxsize=1)
 def GetISSNMatcher():
     return re.compile('([0-9]{4}-[0-9]{3}[0-9X])')
 
@@ -32,10 +32,11 @@ def _SigAlarmHandler(signal_no, frame):
    pass
 
 
-# N.B., if provided, "args" must be a list, ditto for "env".  "timeout" is in seconds.
+# N.B., if provided, "args" must be a list, ditto for "env".  "timeout" is in seconds.  If "cwd" is not None,
+# the child changes to that directory after redirecting its output and before executing "cmd_path".
 # @return either the exit code of the child, or if there was a timeout then -1
 def Exec(cmd_path: str, args: List[str] = None, timeout: int = 0, env: Dict[str, str] = None, new_stdout: str = None, new_stderr: str = None,
-         append_stdout: bool = False, append_stderr: bool = False, setsid: bool = True) -> int:
+         append_stdout: bool = False, append_stderr: bool = False, setsid: bool = True, cwd: str = None) -> int:
 
     def PathIsATTY(path: str) -> bool:
         if not os.path.exists(path):
@@ -49,6 +50,8 @@ def Exec(cmd_path: str, args: List[str] = None, timeout: int = 0, env: Dict[str,
     if not os.access(cmd_path, os.X_OK):
         raise Exception("in process_util.Exec: command \"" + cmd_path + "\" either does not exist or is not executable!")
 
+    # Otherwise buffered output of ours would appear after the child's and, if the child exits without exec'ing, twice.
+    util.FlushInfo()
     child_pid = os.fork()
     if child_pid != 0: # We're the parent.
         if timeout != 0:
@@ -105,6 +108,9 @@ def Exec(cmd_path: str, args: List[str] = None, timeout: int = 0, env: Dict[str,
                 sys.stderr = open(new_stderr, "wb")
             os.dup2(sys.stderr.fileno(), 2)
 
+        if cwd is not None:
+            os.chdir(cwd)
+
         errno.errno = 0
         args = [cmd_path] + args
         if env is None:
@@ -18,16 +18,10 @@ def Main():
     if len(sys.argv) < 2:
         Usage()
 
-    arg_no = 2
     file_and_member_name_list = []
-    while arg_no < len(sys.argv):
-        first_colon_pos = (sys.argv[arg_no]).find(":")
-        if first_colon_pos == -1:
-            file_and_member_name_list.append((sys.argv[arg_no], None))
-        else:
-            file_and_member_name_list.append((sys.argv[arg_no][0 : first_colon_pos],
-                                              sys.argv[arg_no][first_colon_pos + 1 : ]))
-        arg_no += 1
+    for arg in sys.argv[2:]:
+        file_name, colon, member_name = arg.partition(":")
+        file_and_member_name_list.append((file_name, member_name if colon else None))
 
     util.CreateTarball(sys.argv[1], file_and_member_name_list)
 
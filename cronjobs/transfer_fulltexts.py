@@ -15,25 +15,47 @@ server_password = XXXXXX
 [Upload]
 local_directory = "/usr/local/webdav/"
 directory_on_sftp_server = "incoming"
+concurrency = 8
 """
 
+from concurrent.futures import ThreadPoolExecutor
 import datetime
 import fnmatch
 import os
+import re
 import shutil
+import subprocess
 import sys
 import traceback
 import util
 
 
-# see https://stackoverflow.com/questions/1724693/find-a-file-in-python (180704)
+_compiled_glob_patterns = {}
+
+
+# @return A compiled regex equivalent to the glob "pattern".  Compiled patterns are cached across calls.
+def CompileGlobPattern(pattern):
+    compiled_pattern = _compiled_glob_patterns.get(pattern)
+    if compiled_pattern is None:
+        compiled_pattern = re.compile(fnmatch.translate(pattern))
+        _compiled_glob_patterns[pattern] = compiled_pattern
+    return compiled_pattern
+
+
+# Recursively yields all non-directory entries below "path" whose names match the glob "pattern".
+# Symlinks to directories are not followed and, like os.walk() does, directories that can't be read are skipped.
 def FindFilesByPattern(pattern, path):
-    result = []
-    for root, dirs, files in os.walk(path):
-        for name in files:
-            if fnmatch.fnmatch(name, pattern):
-                result.append(os.path.join(root, name))
-    return result
+    compiled_pattern = CompileGlobPattern(pattern)
+    try:
+        entries = os.scandir(path)
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from FindFilesByPattern(pattern, entry.path)
+            elif not entry.is_dir() and compiled_pattern.match(entry.name):
+                yield entry.path
 
 
 def StripPathPrefix(entry, start):
@@ -49,10 +71,7 @@ def GetExistingFiles(local_top_dir):
 
 
 def GetFulltextDirectoriesToTransfer(local_top_dir, fulltext_files_path):
-    os.chdir(local_top_dir)
-    stripped_paths = list([StripPathPrefix(path, local_top_dir) for path in fulltext_files_path])
-    directory_set = set(list(map(ExtractDirectories, stripped_paths)))
-    return directory_set
+    return { ExtractDirectories(StripPathPrefix(path, local_top_dir)) for path in fulltext_files_path }
 
 
 def CleanUpFiles(fulltext_dirs):
@@ -67,6 +86,27 @@ def CleanUpFiles(fulltext_dirs):
         return
 
 
+# Splits "dirs_to_transfer" into at most "concurrency" chunks and uploads each chunk with its own
+# instance of transfer_fulltext.sh, i.e. its own SFTP session.
+def TransferDirectories(sftp_host, sftp_user, sftp_keyfile, local_directory, directory_on_sftp_server,
+                        dirs_to_transfer, concurrency):
+    transfer_script = "/usr/local/bin/transfer_fulltext.sh"
+
+    # N.B. we can't use util.ExecOrDie() here since it forks and runs Python code in the child which may deadlock
+    # on locks held by our other threads.
+    def TransferChunk(dirs_chunk):
+        return subprocess.run([transfer_script, sftp_host, sftp_user, sftp_keyfile, local_directory,
+                               directory_on_sftp_server] + dirs_chunk, stdout=sys.stderr, start_new_session=True).returncode
+
+    dirs_to_transfer = sorted(dirs_to_transfer)
+    chunks = [dirs_to_transfer[i::concurrency] for i in range(min(concurrency, len(dirs_to_transfer)))]
+    util.FlushInfo() # Keep our own output ahead of the children's.
+    with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+        failed_chunk_count = sum(1 for returncode in executor.map(TransferChunk, chunks) if returncode != 0)
+    if failed_chunk_count:
+        util.Error("\"" + transfer_script + "\" failed for " + str(failed_chunk_count) + " of " + str(len(chunks))
+                   + " chunks of directories!")
+
 
 def Main():
     if len(sys.argv) != 2:
@@ -81,12 +121,15 @@ def Main():
         sftp_keyfile             = config.get("SFTP", "keyfile")
         local_directory          = config.get("Upload", "local_directory")
         directory_on_sftp_server = config.get("Upload", "directory_on_sftp_server")
+        concurrency              = config.getint("Upload", "concurrency", fallback=8)
 
     except Exception as e:
         util.Error("failed to read config file! (" + str(e) + ")")
+    if concurrency < 1:
+        util.Error("\"concurrency\" in section \"Upload\" must be at least 1!")
 
     # Check directories with new Data
-    fulltext_files = GetExistingFiles(local_directory)
+    fulltext_files = list(GetExistingFiles(local_directory)) # Needed for the transfer, the clean up and the report.
     dirs_to_transfer = GetFulltextDirectoriesToTransfer(local_directory, fulltext_files)
 
     # If nothing to do
@@ -95,9 +138,8 @@ def Main():
         return
 
     # Transfer the data
-    util.ExecOrDie("/usr/local/bin/transfer_fulltext.sh",
-                   [sftp_host, sftp_user, sftp_keyfile, local_directory, directory_on_sftp_server]
-                   + list(dirs_to_transfer))
+    TransferDirectories(sftp_host, sftp_user, sftp_keyfile, local_directory, directory_on_sftp_server,
+                        dirs_to_transfer, concurrency)
     # Clean up on the server
     CleanUpFiles(fulltext_files)
     email_msg_body = "Found Files:\n\n" + '\n'.join(fulltext_files) + "\n\nTransferred directories:\n\n" + '\n'.join(dirs_to_transfer)
@@ -9,31 +9,35 @@ api_key = MY_API_KEY
 changelist_file_regex = changed_dois_with_versions_([\d-]+)(.*)([\d-]).*.jsonl.gz
 """
 
+from concurrent.futures import ThreadPoolExecutor
 import dbus
-import json
+import functools
 import os
 import platform
 import re
+import requests
 import sys
-import time
 import traceback
-import urllib.request, urllib.parse, urllib.error
 import util
-from shutil import copy2, move, rmtree
+from requests.adapters import HTTPAdapter
+from shutil import copy2, copyfileobj, rmtree
+from urllib3.util.retry import Retry
 
-def GetChangelists(url, api_key):
+
+DOWNLOAD_BUFFER_SIZE = 1024 * 1024
+PARTIAL_DOWNLOAD_SUFFIX = ".part"
+MAX_CONCURRENT_DOWNLOADS = 4
+
+
+# N.B. retrying on transient errors is left to "session".
+def GetChangelists(session, url, api_key):
     print("Get Changelists")
-    for attempt_number in range(3):
-        try:
-            response = urllib.request.urlopen(url + '?api_key=' + api_key)
-            jdata = json.load(response)
-            # Get only JSON update entries, no CSV
-            json_update_objects = [item for item in jdata['list'] if item['filetype'] == 'jsonl']
-            return json_update_objects
-        except Exception as e:
-            exception = e
-            time.sleep(10 * (attempt_number + 1))
-    raise exception
+    response = session.get(url, params={ "api_key": api_key }, timeout=(10, 120))
+    response.raise_for_status()
+    jdata = response.json()
+    # Get only JSON update entries, no CSV
+    json_update_objects = [item for item in jdata['list'] if item['filetype'] == 'jsonl']
+    return json_update_objects
 
 
 def GetRemoteUpdateFiles(json_update_objects):
@@ -41,75 +45,146 @@ def GetRemoteUpdateFiles(json_update_objects):
     return json_filenames
 
 
-def GetLocalUpdateFiles(config, local_directory=None):
-    def GetDirectoryContents():
-        if local_directory is None:
-            return os.listdir(".")
-        else:
-            return os.listdir(local_directory)
-    changelist_file_regex = re.compile(config.get("Unpaywall", "changelist_file_regex"))
-    return list(filter(changelist_file_regex.search, GetDirectoryContents()))
+# @param changelist_file_regex  The compiled "changelist_file_regex" from the config file.
+# N.B. unfinished downloads are excluded, cf. DownloadUpdateFiles().
+def GetLocalUpdateFiles(changelist_file_regex, local_directory=None):
+    if local_directory is None:
+        local_directory = "."
+    with os.scandir(local_directory) as entries:
+        return [entry.name for entry in entries
+                if changelist_file_regex.search(entry.name) and not entry.name.endswith(PARTIAL_DOWNLOAD_SUFFIX)]
 
 
-def GetAllFilesStartingAtFirstMissingLocal(remote_update_list, local_update_list):
-    # Strategy: Determine the youngest local file such that all previous files
-    # are already locally present and return all younger remote files
-    youngest_local = next(iter(sorted(local_update_list, reverse=True)))
-    download_list = [item for item in remote_update_list if item > youngest_local]
-    return { "download" :  sorted(download_list) }
+# Strategy: Download every remote file that is younger than the youngest imported file and not locally present.
+# N.B. we must not anchor on the youngest local file since an older file may have failed to download in an earlier
+# run, and neither must we download older files since importing them would overwrite newer data.
+def GetMissingLocalFiles(remote_update_list, local_update_list, imported_update_list):
+    youngest_imported = max(imported_update_list) if imported_update_list else ""
+    return { "download" : sorted(set(item for item in remote_update_list if item > youngest_imported)
+                                 - set(local_update_list)) }
 
 
 def GetDownloadUrlsAndFilenames(download_list, json_update_objects, api_key):
-    download_urls = [item['url'] for item in json_update_objects if item['filename'] in download_list]
-    filenames = [item['filename'] for item in json_update_objects if item['filename'] in download_list]
-    return { "urls": sorted(download_urls), "filenames" : sorted(filenames) }
+    download_set = set(download_list)
+    download_items = sorted((item for item in json_update_objects if item['filename'] in download_set),
+                            key=lambda item: item['filename'])
+    return { "urls": [item['url'] for item in download_items], "filenames" : [item['filename'] for item in download_items] }
 
 
-def GetImportFiles(config, oadoi_download_directory, oadoi_imported_directory):
-    downloaded_files =  GetLocalUpdateFiles(config, oadoi_download_directory)
-    imported_files = GetLocalUpdateFiles(config, oadoi_imported_directory)
-    return list(set(downloaded_files) - set(imported_files))
+# N.B. every entry in "oadoi_imported_directory" is a symlink created by CreateImportedSymlink() for an
+# already imported changefile, so there is no need to match those names against "changelist_file_regex".
+def GetImportedFiles(oadoi_imported_directory):
+    with os.scandir(oadoi_imported_directory) as entries:
+        return { entry.name for entry in entries if entry.is_symlink() }
 
 
-def DownloadUpdateFiles(download_list, json_update_objects, api_key, target_directory=None):
-    download_urls_and_filenames = GetDownloadUrlsAndFilenames(download_list, json_update_objects, api_key)
-    if not target_directory is None:
-       os.chdir(target_directory)
+# @return The downloaded but not yet imported changefiles in chronological order.
+def GetImportFiles(downloaded_files, imported_files):
+    return sorted(set(downloaded_files) - set(imported_files))
+
 
-    oadoi_downloader = urllib.request.URLopener()
-    for url, filename in zip(download_urls_and_filenames['urls'], download_urls_and_filenames['filenames']):
-        print("Downloading \"" + url + "\" to \"" + filename + "\"")
-        oadoi_downloader.retrieve(url, filename)
+# @return A session that keeps connections to the Unpaywall servers alive across requests and retries
+#         failed requests with exponential backoff, honouring "Retry-After" headers.
+def CreateHTTPSession():
+    session = requests.Session()
+    retries = Retry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                    respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
-def CreateImportedSymlink(filename, dest):
+# @return The size of the file at "url" according to the server or None if the server does not tell us.
+def GetRemoteFileSize(session, url):
+    response = session.head(url, allow_redirects=True, timeout=(10, 120))
+    response.raise_for_status()
+    content_length = response.headers.get("Content-Length")
+    return int(content_length) if content_length is not None else None
+
+
+def DownloadUpdateFiles(session, download_list, json_update_objects, api_key, target_directory=None):
+    download_urls_and_filenames = GetDownloadUrlsAndFilenames(download_list, json_update_objects, api_key)
+    if target_directory is None:
+        target_directory = "."
+
+    # Files are downloaded under a temporary name and only renamed once they are complete, so that a failed
+    # download is resumed in the next run instead of being imported truncated.
+    def DownloadFile(url, filename):
+        path = os.path.join(target_directory, filename)
+        partial_path = path + PARTIAL_DOWNLOAD_SUFFIX
+        partial_size = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        headers = {}
+        if partial_size > 0:
+            remote_size = GetRemoteFileSize(session, url)
+            if remote_size == partial_size:
+                print("\"" + partial_path + "\" is already complete")
+                os.replace(partial_path, path)
+                return
+            if remote_size is not None and partial_size < remote_size:
+                headers["Range"] = "bytes=" + str(partial_size) + "-"
+        print("Downloading \"" + url + "\" to \"" + path + "\"")
+        with session.get(url, headers=headers, stream=True, timeout=(10, 120)) as response:
+            response.raise_for_status()
+            # The server may ignore our range request and send the whole file.
+            resumed = response.status_code == 206
+            content_length = response.headers.get("Content-Length")
+            expected_size = None
+            if content_length is not None:
+                expected_size = int(content_length) + (partial_size if resumed else 0)
+            with open(partial_path, "ab" if resumed else "wb") as output:
+                copyfileobj(response.raw, output, length=DOWNLOAD_BUFFER_SIZE)
+        if expected_size is not None and os.path.getsize(partial_path) != expected_size:
+            raise Exception("incomplete download of \"" + url + "\"")
+        os.replace(partial_path, path)
+
+    # N.B. we don't give up on the remaining downloads if one of them fails but nothing must be imported in that
+    # case since the changefiles have to be imported in chronological order.
+    failures = []
+    def TryDownloadFile(url, filename):
+        try:
+            DownloadFile(url, filename)
+        except Exception as e:
+            failures.append("\"" + url + "\": " + str(e))
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DOWNLOADS) as executor:
+        list(executor.map(TryDownloadFile, download_urls_and_filenames['urls'], download_urls_and_filenames['filenames']))
+    if failures:
+        raise Exception("failed to download " + str(len(failures)) + " changefile(s):\n" + "\n".join(failures))
+
+
+def CreateImportedSymlink(source, dest):
     print("Creating symlink in imported directory")
-    os.symlink(os.getcwd() + "/" + filename, dest)
+    try:
+        os.symlink(source, dest)
+    except FileExistsError:
+        print("Symlink \"" + dest + "\" already exists")
 
 
+# N.B. "update_list" must only contain changefiles that have not been imported yet, cf. GetImportFiles().
 def ImportOADOIsToMongo(update_list, source_directory=None, log_file_name="/dev/stderr"):
-    if not source_directory is None:
-       os.chdir(source_directory)
-    imported_symlinks_directory = os.getcwd() + "/imported"
+    source_directory = os.path.abspath(source_directory if source_directory is not None else ".")
+    imported_symlinks_directory = os.path.join(source_directory, "imported")
     for filename in update_list:
-        imported_symlink_full_path = imported_symlinks_directory + "/" + filename
-        if os.path.islink(imported_symlink_full_path):
-            print("Skipping " + filename + " since apparently already imported")
-            continue
+        imported_symlink_full_path = os.path.join(imported_symlinks_directory, filename)
         print("Importing \"" + filename + "\"")
-        util.ExecOrDie(util.Which("import_oadois_to_mongo.sh"), [ filename ], log_file_name)
-        CreateImportedSymlink(filename, imported_symlink_full_path)
+        util.ExecOrDie(util.Which("import_oadois_to_mongo.sh"), [ filename ], log_file_name, cwd=source_directory)
+        CreateImportedSymlink(os.path.join(source_directory, filename), imported_symlink_full_path)
 
 
-def ExtractOADOIURLs(share_directory, all_dois_file, urls_file, log_file_name):
+# N.B. extract_oadoi_urls.sh creates "urls_file" and its intermediate files in "working_directory".
+def ExtractOADOIURLs(share_directory, all_dois_file, urls_file, log_file_name, working_directory):
     print("Extract URLs for DOI's in " + all_dois_file)
-    util.ExecOrDie(util.Which("extract_oadoi_urls.sh"), [ share_directory + '/' + all_dois_file, urls_file ], log_file_name)
+    util.ExecOrDie(util.Which("extract_oadoi_urls.sh"), [ os.path.join(share_directory, all_dois_file), urls_file ], log_file_name,
+                   cwd=working_directory)
 
 
-def ShareOADOIURLs(share_directory, urls_file):
-    copy2(urls_file, share_directory)
+def ShareOADOIURLs(share_directory, urls_file, working_directory):
+    copy2(os.path.join(working_directory, urls_file), share_directory)
 
 
+# N.B. the result of this function and GetSystemDDBusManager() is cached since we need it for both
+# starting and stopping the service.
+@functools.lru_cache(maxsize=1)
 def GetMongoServiceDependingOnSystem():
     distro = platform.linux_distribution()[0];
     if re.search('CentOS', distro):
@@ -120,6 +195,7 @@ def GetMongoServiceDependingOnSystem():
     sys.exit(-1)
 
 
+@functools.lru_cache(maxsize=1)
 def GetSystemDDBusManager():
     sysbus = dbus.SystemBus()
     systemd1 = sysbus.get_object('org.freedesktop.systemd1', '/org/freedesktop/systemd1')
@@ -138,16 +214,17 @@ def StopMongoDB():
 
 
 def DumpMongoDB(config, log_file_name="/dev/stderr"):
-    # Backup to intermediate hidden directory that is exluded from backup
+    # Backup to intermediate hidden archive that is exluded from backup
     # to prevent inconsistent saving
     dump_base_path = config.get("LocalConfig", "dump_base_path")
     dump_root = config.get("LocalConfig", "dump_root")
-    intermediate_dump_dir = dump_base_path + '/.' + dump_root
-    util.ExecOrDie(util.Which("mongodump"), [ "--out=" + intermediate_dump_dir , "--gzip" ], log_file_name)
-    final_dump_dir = dump_base_path + '/' + dump_root
-    if os.path.exists(final_dump_dir) and os.path.isdir(final_dump_dir):
+    intermediate_dump_archive = os.path.join(dump_base_path, "." + dump_root + ".archive.gz")
+    util.ExecOrDie(util.Which("mongodump"), [ "--archive=" + intermediate_dump_archive , "--gzip" ], log_file_name)
+    os.replace(intermediate_dump_archive, os.path.join(dump_base_path, dump_root + ".archive.gz"))
+    # Remove a dump directory left over from before we switched to archives
+    final_dump_dir = os.path.join(dump_base_path, dump_root)
+    if os.path.isdir(final_dump_dir):
         rmtree(final_dump_dir)
-    move(intermediate_dump_dir, final_dump_dir)
 
 
 def Main():
@@ -163,28 +240,32 @@ def Main():
     log_file_name = log_file_name = util.MakeLogFileName(sys.argv[0], util.GetLogDirectory())
     changelist_url = config.get("Unpaywall", "changelist_url")
     api_key = config.get("Unpaywall", "api_key")
+    changelist_file_regex = re.compile(config.get("Unpaywall", "changelist_file_regex"))
     oadoi_download_directory = config.get("LocalConfig", "download_dir")
-    oadoi_imported_directory = oadoi_download_directory + "/imported/"
+    oadoi_imported_directory = os.path.join(oadoi_download_directory, "imported")
     StartMongoDB()
-    json_update_objects = GetChangelists(changelist_url, api_key)
+    session = CreateHTTPSession()
+    json_update_objects = GetChangelists(session, changelist_url, api_key)
     remote_update_files = GetRemoteUpdateFiles(json_update_objects)
-    local_update_files = GetLocalUpdateFiles(config, oadoi_download_directory)
-    download_lists = GetAllFilesStartingAtFirstMissingLocal(remote_update_files, local_update_files)
-    DownloadUpdateFiles(download_lists['download'], json_update_objects, api_key, oadoi_download_directory)
+    local_update_files = GetLocalUpdateFiles(changelist_file_regex, oadoi_download_directory)
+    imported_files = GetImportedFiles(oadoi_imported_directory)
+    download_lists = GetMissingLocalFiles(remote_update_files, local_update_files, imported_files)
+    DownloadUpdateFiles(session, download_lists['download'], json_update_objects, api_key, oadoi_download_directory)
 
     # Update the Database
-    ImportOADOIsToMongo(GetImportFiles(config, oadoi_download_directory, oadoi_imported_directory), oadoi_download_directory, log_file_name)
+    downloaded_files = local_update_files + list(filter(changelist_file_regex.search, download_lists['download']))
+    ImportOADOIsToMongo(GetImportFiles(downloaded_files, imported_files), oadoi_download_directory, log_file_name)
 
     # Generate the files to be used by the pipeline
     share_directory = config.get("LocalConfig", "share_directory")
     ixtheo_dois_file = config.get("LocalConfig", "ixtheo_dois_file")
     ixtheo_urls_file = config.get("LocalConfig", "ixtheo_urls_file")
-    ExtractOADOIURLs(share_directory, ixtheo_dois_file, ixtheo_urls_file, log_file_name)
-    ShareOADOIURLs(share_directory, ixtheo_urls_file)
+    ExtractOADOIURLs(share_directory, ixtheo_dois_file, ixtheo_urls_file, log_file_name, oadoi_download_directory)
+    ShareOADOIURLs(share_directory, ixtheo_urls_file, oadoi_download_directory)
     krimdok_dois_file = config.get("LocalConfig", "krimdok_dois_file")
     krimdok_urls_file = config.get("LocalConfig", "krimdok_urls_file")
-    ExtractOADOIURLs(share_directory, krimdok_dois_file, krimdok_urls_file, log_file_name)
-    ShareOADOIURLs(share_directory, krimdok_urls_file)
+    ExtractOADOIURLs(share_directory, krimdok_dois_file, krimdok_urls_file, log_file_name, oadoi_download_directory)
+    ShareOADOIURLs(share_directory, krimdok_urls_file, oadoi_download_directory)
     DumpMongoDB(config, log_file_name)
     StopMongoDB()
     util.SendEmail("Update OADOI Data",
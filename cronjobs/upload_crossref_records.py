@@ -15,10 +15,14 @@ server_password = XXXXXX
 
 [Upload]
 directory_on_ftp_server = "Tuebingen_crossref2"
+# Optional, if true the MARC-XML will be gzipped before uploading it
+compress = false
 """
 
 from ftp_connection import FTPConnection
+import gzip
 import os
+import shutil
 import subprocess
 import sys
 import time
@@ -32,9 +36,18 @@ def DownloadCrossrefData(output_marc_filename):
     util.ExecOrDie("/usr/local/bin/crossref_downloader",
                    [ "/usr/local/var/lib/tuelib/crossref_downloader/crossref_journal_list", output_marc_filename ],
                    "/proc/self/fd/1")
-    process = subprocess.Popen(["marc_size", output_marc_filename], stdout=subprocess.PIPE)
-    size = process.stdout.readline()
-    return int(size) if len(size) > 0 else 0
+    output_lines = subprocess.run(["marc_size", output_marc_filename], stdout=subprocess.PIPE,
+                                  check=True).stdout.splitlines()
+    return int(output_lines[0]) if len(output_lines) > 0 else 0
+
+
+# Writes a gzipped copy of "filename" next to it.
+# @return The name of the compressed file.
+def CompressFile(filename):
+    compressed_filename = filename + ".gz"
+    with open(filename, "rb") as input_file, gzip.open(compressed_filename, "wb", compresslevel=6) as output_file:
+        shutil.copyfileobj(input_file, output_file, 1024 * 1024)
+    return compressed_filename
 
 
 def GenerateRemoteFilename():
@@ -53,6 +66,7 @@ def Main():
         ftp_user                = config.get("FTP", "username")
         ftp_passwd              = config.get("FTP", "password")
         directory_on_ftp_server = config.get("Upload", "directory_on_ftp_server")
+        compress                = config.getboolean("Upload", "compress", fallback=False)
     except Exception as e:
         util.Error("failed to read config file! (" + str(e) + ")")
 
@@ -63,7 +77,12 @@ def Main():
     else:
         ftp = FTPConnection(ftp_host, ftp_user, ftp_passwd)
         ftp.changeDirectory(directory_on_ftp_server)
-        ftp.uploadFile(marc_filename, GenerateRemoteFilename())
+        if compress:
+            compressed_marc_filename = CompressFile(marc_filename)
+            ftp.uploadFile(compressed_marc_filename, GenerateRemoteFilename() + ".gz")
+            os.unlink(compressed_marc_filename)
+        else:
+            ftp.uploadFile(marc_filename, GenerateRemoteFilename())
         email_msg_body = "Uploaded " + str(no_of_records) + " MARC records to the BSZ FTP server.\n\n"
     os.unlink(marc_filename)
     util.SendEmail("BSZ Crossref File Upload", email_msg_body, priority=5)
@@ -1,28 +1,30 @@
 # Python 3 module
 # -*- coding: utf-8 -*-
-from email.mime.application import MIMEApplication
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from email.message import EmailMessage
 from typing import List
+import atexit
 import configparser
-import ctypes
 import datetime
 import email
 import enum
 import errno
+import fnmatch
+import functools
 import glob
-import inspect
 import mmap
 import os
 import process_util
+import random
 import re
+import shutil
 import smtplib
 import socket
+import stat
 import struct
 import sys
 import tarfile
+import threading
 import time
-import urllib.request
 
 
 def WgetFetch(url: str) -> bool:
@@ -42,46 +44,71 @@ class RetrieveFileByURLReturnCode(enum.Enum):
     BAD_CONTENT_TYPE = 5
 
 
+RETRIEVE_CONNECT_TIMEOUT = 5 # seconds
+RETRIEVE_MAX_ATTEMPTS = 10
+RETRIEVE_BACKOFF_BASE = 10 # seconds
+RETRIEVE_MAX_BACKOFF = 60 # seconds
+_retrieve_session = None
+
+
+# @return A session that keeps connections alive across RetrieveFileByURL() attempts.  It does not retry by itself
+#         since RetrieveFileByURL() implements its own retry policy.
+def _GetRetrieveSession():
+    import requests
+    global _retrieve_session
+    if _retrieve_session is None:
+        _retrieve_session = requests.Session()
+    return _retrieve_session
+
+
 # @brief Fetch a file given a URL
 # @param url                    The URL to fetch.
 # @param timeout                Give up if it takes longer than this many seconds to retrieve the file.
 # @param accepted_content_types If non-empty, a list of acceptable content types.  If empty, anything will be accepted.
 def RetrieveFileByURL(url: str, timeout: int, accepted_content_types: List[str] = []) -> RetrieveFileByURLReturnCode:
+    # N.B. imported here so that the many scripts that use this module without ever retrieving anything don't depend
+    # on "requests".
+    import requests
     deadline: int = time.time() + timeout
     attempt_no: int = 0
-    while time.time() < deadline:
+    while time.time() < deadline and attempt_no < RETRIEVE_MAX_ATTEMPTS:
+        sleep_interval = None # Set if the server told us how long to wait.
         try:
-            headers = urllib.request.urlretrieve(url)[1]
-            if accepted_content_types:
-                content_type: str = headers["Content-type"].lower()
-                for accepted_content_type in accepted_content_types:
-                    if accepted_content_type.lower() == content_type:
-                        return RetrieveFileByURLReturnCode.SUCCESS
-                Warning("in RetrieveFileByURL: Content-type was \"" + content_type + "\"!")
-                return RetrieveFileByURLReturnCode.BAD_CONTENT_TYPE
-            return RetrieveFileByURLReturnCode.SUCCESS
-        except urllib.error.URLError:
+            # Only the status and the headers are of interest, so we never read the body.
+            with _GetRetrieveSession().get(url, stream=True,
+                                           timeout=(RETRIEVE_CONNECT_TIMEOUT, max(1, deadline - time.time()))) as response:
+                if response.status_code == 429:
+                    if response.headers.get("Retry-After"):
+                        try:
+                            sleep_interval = int(response.headers["Retry-After"])
+                        except ValueError:
+                            sleep_interval = HTTPDateToSecondsRelativetoUnixEpoch(response.headers["Retry-After"]) - time.time()
+                        if time.time() + sleep_interval > deadline:
+                            return RetrieveFileByURLReturnCode.TIMEOUT
+                elif not response.ok:
+                    print("HTTP error reason: " + response.reason)
+                    print("HTTP headers: " + str(response.headers))
+                    return RetrieveFileByURLReturnCode.HTTP_ERROR
+                elif accepted_content_types:
+                    content_type: str = response.headers.get("Content-type", "").lower()
+                    for accepted_content_type in accepted_content_types:
+                        if accepted_content_type.lower() == content_type:
+                            return RetrieveFileByURLReturnCode.SUCCESS
+                    Warning("in RetrieveFileByURL: Content-type was \"" + content_type + "\"!")
+                    return RetrieveFileByURLReturnCode.BAD_CONTENT_TYPE
+                else:
+                    return RetrieveFileByURLReturnCode.SUCCESS
+        except requests.exceptions.Timeout:
+            return RetrieveFileByURLReturnCode.TIMEOUT
+        except requests.exceptions.ConnectionError:
             return RetrieveFileByURLReturnCode.URL_NOT_FOUND
-        except urllib.error.HTTPError as http_error:
-            if http_error.code != 429:
-                print("HTTP error reason: " + http_error.reason)
-                print("HTTP headers: " + str(http_error.headers))
-                return RetrieveFileByURLReturnCode.HTTP_ERROR
-            if http_error.headers["Retry-After"]:
-                timeout_or_date: str = http_error.headers["Retry-After"]
-                try:
-                    sleep_interval = int(http_error.headers["Retry-After"])
-                except:
-                    sleep_interval = HTTPDateToSecondsRelativetoUnixEpoch(http_error.headers["Retry-After"]) - time.time()
-                if time.time() + sleep_interval > deadline:
-                    return RetrieveFileByURLReturnCode.TIMEOUT
-        except:
+        except Exception:
             return RetrieveFileByURLReturnCode.UNSPECIFIED_ERROR
 
-        if 'sleep_interval' not in locals():
-            sleep_interval: int = max(0, min(deadline - time.time(), 10 * 2 ** attempt_no))
+        if sleep_interval is None:
+            sleep_interval = min(RETRIEVE_MAX_BACKOFF, RETRIEVE_BACKOFF_BASE * 2 ** attempt_no) + random.uniform(0, 1.0)
         attempt_no += 1
-        time.sleep(sleep_interval)
+        time.sleep(max(0, min(deadline - time.time(), sleep_interval)))
     return RetrieveFileByURLReturnCode.TIMEOUT
 
 
@@ -89,6 +116,62 @@ default_email_recipient = "johannes.riedl@uni-tuebingen.de"
 default_config_file_dir = "/usr/local/var/lib/tuelib/cronjobs/"
 
 
+smtp_config_file = default_config_file_dir + "smtp_server.conf"
+_smtp_config = None
+
+
+# @return The 3-tuple (server_address, server_user, server_password), only read from "smtp_config_file" once.
+def _GetSMTPConfig():
+    global _smtp_config
+    if _smtp_config is None:
+        config = LoadConfigFile(smtp_config_file, no_error=True)
+        _smtp_config = (config.get("SMTPServer", "server_address"), config.get("SMTPServer", "server_user"),
+                        config.get("SMTPServer", "server_password"))
+    return _smtp_config
+
+
+# Authenticated SMTP connections keyed by (server_address, server_user) so that repeated calls to SendEmail() don't
+# each have to go through connect, EHLO, STARTTLS and AUTH again.
+_smtp_connections = {}
+
+
+def _CloseSMTPConnections():
+    for server in _smtp_connections.values():
+        try:
+            server.quit()
+        except Exception:
+            pass
+    _smtp_connections.clear()
+
+
+atexit.register(_CloseSMTPConnections)
+
+
+# @return An authenticated SMTP connection, either a cached one that still responds or a new one.
+def _GetSMTPConnection(server_address, server_user, server_password):
+    key = (server_address, server_user)
+    server = _smtp_connections.get(key)
+    if server is not None:
+        try:
+            if server.noop()[0] == 250:
+                return server
+        except smtplib.SMTPException:
+            pass
+        try:
+            server.close()
+        except Exception:
+            pass
+        del _smtp_connections[key]
+
+    server = smtplib.SMTP(server_address)
+    server.ehlo()
+    server.starttls()
+    server.ehlo()
+    server.login(server_user, server_password)
+    _smtp_connections[key] = server
+    return server
+
+
 # @param priority  The importance of the email.  Must be an integer from 1 to 5 with 1 being the lowest priority.
 # @param attachment A path to the file that should be attached. Can be string or list of strings.
 def SendEmail(subject: str, msg: str, sender: str = None, recipient: str = None, cc : str = None, priority: int = None,
@@ -101,18 +184,35 @@ def SendEmail(subject: str, msg: str, sender: str = None, recipient: str = None,
             Error("util.Sendmail called with a non-int priority!")
         if priority < 1 or priority > 5:
             Error("util.Sendmail called with a prioity that is not in [1..5]!")
+    if sender is None:
+        sender = "no-reply@ub.uni-tuebingen.de"
     try:
-        config = LoadConfigFile("/usr/local/var/lib/tuelib/cronjobs/smtp_server.conf", no_error=True)
-        server_address  = config.get("SMTPServer", "server_address")
-        server_user     = config.get("SMTPServer", "server_user")
-        if sender is None:
-            sender = "no-reply@ub.uni-tuebingen.de"
-        server_password = config.get("SMTPServer", "server_password")
+        server_address, server_user, server_password = _GetSMTPConfig()
     except Exception as e:
         Info("failed to read config file! (" + str(e) + ")", file=sys.stderr)
         sys.exit(-1)
 
-    message = MIMEMultipart()
+    try:
+        server = _GetSMTPConnection(server_address, server_user, server_password)
+    except Exception as e:
+        Info("Failed to send your email: " + str(e), file=sys.stderr)
+        sys.exit(-1)
+
+    if attachments is not None:
+        if not isinstance(attachments, list):
+            attachments = [ attachments ]
+
+        # Don't bother reading and encoding attachments that would make the server reject the message.  The
+        # estimate accounts for the base64 encoding of the attachments.
+        max_message_size = int(server.esmtp_features.get("size", "0") or "0")
+        if max_message_size > 0:
+            estimated_size = len(msg) + sum(4 * (os.path.getsize(attachment) + 2) // 3 for attachment in attachments)
+            if estimated_size > max_message_size:
+                msg += ("\n\nAttachments omitted since they exceed the maximum message size of the mail server: "
+                        + ", ".join(attachments))
+                attachments = None
+
+    message = EmailMessage()
     message["Subject"] = subject
     message["From"] = sender
     message["To"] = recipient
@@ -120,28 +220,19 @@ def SendEmail(subject: str, msg: str, sender: str = None, recipient: str = None,
         message["Cc"] = cc
     if priority is not None:
         message["X-Priority"] = str(priority)
-    message.attach(MIMEText(msg, 'plain', 'utf-8'))
+    message.set_content(msg, charset='utf-8', cte='base64') # Same as MIMEText with a utf-8 charset.
 
     if attachments is not None:
-        if not isinstance(attachments, list):
-            attachments = [ attachments ]
-
         for attachment in attachments:
-            with open(attachment, "rb") as file:
-                part = MIMEApplication(file.read(), Name=os.path.basename(attachment))
-            part['Content-Disposition'] = 'attachment; filename="%s"' % os.path.basename(attachment)
-            message.attach(part)
+            with open(attachment, "rb", buffering=COPY_BUFFER_SIZE) as file:
+                message.add_attachment(file.read(), maintype="application", subtype="octet-stream",
+                                       filename=os.path.basename(attachment))
 
-    server = smtplib.SMTP(server_address)
     try:
-        server.ehlo()
-        server.starttls()
-        server.login(server_user, server_password)
-        server.sendmail(sender, [recipient], message.as_string())
+        server.send_message(message, from_addr=sender, to_addrs=[recipient])
     except Exception as e:
         Info("Failed to send your email: " + str(e), file=sys.stderr)
         sys.exit(-1)
-    server.quit()
 
     if log:
         message = "Sent email " + subject
@@ -163,22 +254,78 @@ def SendEmailAndExit(subject: str, msg: str, sender: str = None, recipient: str
     sys.exit(-1)
 
 
+# @return "file.function" of the caller of the function that called us.
+def _GetCallerName():
+    caller_code = sys._getframe(2).f_code
+    return os.path.basename(caller_code.co_filename) + "." + caller_code.co_name
+
+
 def Error(msg):
-    msg = os.path.basename(inspect.stack()[1][1]) + "." + inspect.stack()[1][3] + ": " + msg
+    msg = _GetCallerName() + ": " + msg
+    FlushInfo()
     Info(sys.argv[0] + ": " + msg, file=sys.stderr)
     SendEmail("Script error (script: " + os.path.basename(sys.argv[0]) + ")!", msg, priority=1)
     sys.exit(1)
 
 
 def Warning(msg):
-    msg = os.path.basename(inspect.stack()[1][1]) + "." + inspect.stack()[1][3] + ": " + msg
+    msg = _GetCallerName() + ": " + msg
+    FlushInfo()
     Info(sys.argv[0] + ": " + msg, file=sys.stderr)
 
 
+_stdout_is_a_tty = sys.stdout.isatty()
+
+
+# @note Output to a non-interactive stdout, typically a cron log file, is not flushed after each call.  Use FlushInfo()
+#       where ordering relative to other writers matters.  process_util.Exec() does so before starting a child.
 def Info(*args, file=sys.stdout):
-    for arg in args:
-        print(arg, file=file, end='')
-    print(file=file, flush=True)
+    file.write("".join(str(arg) for arg in args) + "\n")
+    if file is not sys.stdout or _stdout_is_a_tty:
+        file.flush()
+
+
+def FlushInfo():
+    sys.stdout.flush()
+
+
+atexit.register(FlushInfo)
+
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+# Copies "source" to "target" through a single reused buffer, so that memory use stays bounded by "buffer_size"
+# regardless of the amount of data and no new bytes object is allocated per chunk.
+def _CopyStream(source, target, buffer_size=COPY_BUFFER_SIZE):
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    while True:
+        count = source.readinto(buffer)
+        if not count:
+            return
+        target.write(view[:count])
+
+
+# Appends the contents of "source_file" to "target_file", in the kernel via os.sendfile() where possible.
+# N.B. only regular files are copied with os.sendfile() since e.g. procfs files and pipes report a size of 0.
+def _CopyFileContents(source_file, target_file):
+    source_fd = source_file.fileno()
+    stat_buf = os.fstat(source_fd)
+    if hasattr(os, "sendfile") and stat.S_ISREG(stat_buf.st_mode):
+        target_file.flush()
+        target_fd = target_file.fileno()
+        offset = 0
+        try:
+            while True: # Until end-of-file, in case "source_file" grows while we copy it.
+                sent = os.sendfile(target_fd, source_fd, offset, max(stat_buf.st_size - offset, COPY_BUFFER_SIZE))
+                if sent == 0:
+                    return
+                offset += sent
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.ENOSYS) or offset != 0:
+                raise
+    _CopyStream(source_file, target_file)
 
 
 # @brief Copy the contents, in order, of "files" into "target".
@@ -188,7 +335,14 @@ def ConcatenateFiles(files, target):
         Error("\"files\" argument to util.ConcatenateFiles() is empty or None!")
     if target is None or len(target) == 0:
         Error("\"target\" argument to util.ConcatenateFiles() is empty or None!")
-    return process_util.Exec("/bin/cat", files, new_stdout=target) == 0
+    try:
+        with open(target, "wb") as target_file:
+            for file in files:
+                with open(file, "rb") as source_file:
+                    _CopyFileContents(source_file, target_file)
+        return True
+    except OSError:
+        return False
 
 
 # Fails if "source" does not exist or if "link_name" exists and is not a symlink.
@@ -199,12 +353,16 @@ def SafeSymlink(source, link_name):
     except Exception as e:
         Error("in util.SafeSymlink: os.lstat(" + source + ") failed: " + str(e))
 
-    if os.path.islink(link_name):
+    try:
+        link_mode = os.lstat(link_name).st_mode
+    except FileNotFoundError:
+        link_mode = 0 # Matches none of the file types below.
+    if stat.S_ISLNK(link_mode):
         os.unlink(link_name)
-    elif os.path.isfile(link_name):
+    elif stat.S_ISREG(link_mode):
         Error("in util.SafeSymlink: trying to create a symlink to \"" + link_name
               + "\" which is an existing non-symlink file!")
-    elif os.path.isdir(link_name):
+    elif stat.S_ISDIR(link_mode):
         Error("in util.SafeSymlink: trying to create a symlink to \"" + link_name
               + "\" which is an existing non-symlink directory!")
     try:
@@ -241,10 +399,12 @@ def ReadTimestamp(prefix = None):
     if prefix is None:
         prefix = os.path.basename(sys.argv[0])[:-3]
     timestamp_filename = prefix + ".timestamp"
-    if not os.access(timestamp_filename, os.R_OK):
+    try:
+        timestamp_file = open(timestamp_filename, "rb")
+    except OSError:
         return 0
-    with open(timestamp_filename, "rb") as timestamp_file:
-        (timestamp, ) = struct.unpack('d', timestamp_file.read())
+    with timestamp_file:
+        (timestamp, ) = struct.unpack('d', timestamp_file.read(struct.calcsize('d')))
         return timestamp
 
 
@@ -260,11 +420,21 @@ def WriteTimestamp(prefix=None, timestamp=None):
     if timestamp is None:
         timestamp = time.time()
     timestamp_filename = prefix + ".timestamp"
-    Remove(timestamp_filename)
-    with open(timestamp_filename, "wb") as timestamp_file:
+    # Write a temporary file and swap it in, so that a crash never leaves a missing or truncated timestamp behind.
+    temp_timestamp_filename = timestamp_filename + ".tmp"
+    with open(temp_timestamp_filename, "wb") as timestamp_file:
         timestamp_file.write(struct.pack('d', timestamp))
+        timestamp_file.flush()
+        os.fsync(timestamp_file.fileno())
+    os.replace(temp_timestamp_filename, timestamp_filename)
+
+
+# Parsed config files keyed by (absolute path, mtime, size) so that a file is only re-parsed after it has changed.
+_config_cache = {}
+_config_cache_lock = threading.Lock()
 
 
+# @note The returned ConfigParser may be shared with other callers and must not be modified.
 def LoadConfigFile(path=None, no_error=False):
     if path is None: # Take script name w/ "py" extension replaced by "conf".
         # Check whether there is a machine specific subdirectory
@@ -273,12 +443,27 @@ def LoadConfigFile(path=None, no_error=False):
         if not os.access(path, os.R_OK):
             path = default_config_file_dir + os.path.basename(sys.argv[0])[:-2] + "conf"
     try:
-        if not os.access(path, os.R_OK):
+        try:
+            stat_buf = os.stat(path)
+        except OSError:
+            stat_buf = None
+        if stat_buf is not None:
+            abs_path = os.path.abspath(path)
+            key = (abs_path, stat_buf.st_mtime_ns, stat_buf.st_size)
+            with _config_cache_lock:
+                config = _config_cache.get(key)
+                if config is not None:
+                    return config
+        if stat_buf is None or not os.access(path, os.R_OK):
             if no_error:
                 raise OSError("in util.LoadConfigFile: can't open \"" + path + "\" for reading!")
             Error("in util.LoadConfigFile: can't open \"" + path + "\" for reading!")
         config = configparser.ConfigParser()
         config.read(path)
+        with _config_cache_lock:
+            for stale_key in [ cached_key for cached_key in _config_cache if cached_key[0] == abs_path ]:
+                del _config_cache[stale_key]
+            _config_cache[key] = config
         return config
     except Exception as e:
         if no_error:
@@ -286,50 +471,66 @@ def LoadConfigFile(path=None, no_error=False):
         Error("in util.LoadConfigFile: failed to load the config file from \"" + path + "\"! (" + str(e) + ")")
 
 
+_BSZ_VALID_MEMBER_NAME_PATTERN = re.compile(r"(aut|tit)\.mrc$")
+_BSZ_TITLE_DATA_MEMBER_NAME = "tit.mrc"
+_BSZ_NORM_DATA_MEMBER_NAME = "aut.mrc"
+
+
 # Extracts the typical files from a gzipped tar archive.
 # @param name_prefix  If not None, this will be prepended to the names of the extracted files
 # @return The list of names of the extracted files in the order: title data, superior data, norm data
 def ExtractAndRenameBSZFiles(gzipped_tar_archive, name_prefix = None):
-    # Ensures that all members of "gzipped_tar_archive" match our expectation as to what the BSZ should deliver.
-    def TarFileMemberNamesAreOkOrDie(tar_file, archive_name):
-        compiled_pattern = re.compile("(aut|tit).mrc$")
-        for member in tar_file.getnames():
-            if not compiled_pattern.search(member):
-                Error("unknown tar file member \"" + member + "\" in \"" + archive_name + "\"!")
-
-
-    # Extracts all tar file members matching "member_pattern" from "tar_file" and concatenates them as "new_name".
-    def ExtractAndRenameMembers(tar_file, member_pattern, new_name):
-        extracted_files = []
-        compiled_pattern = re.compile(member_pattern)
-        for member in tar_file.getnames():
-            if compiled_pattern.match(member):
-                tar_file.extract(member)
-                extracted_files.append(member)
-
-        Remove(new_name)
-        ConcatenateFiles(extracted_files, new_name)
-
-        # Clean up:
-        for extracted_file in extracted_files:
-            Remove(extracted_file)
-
-
     if name_prefix is None:
         name_prefix = ""
-    tar_file = tarfile.open(gzipped_tar_archive, "r:gz")
-    TarFileMemberNamesAreOkOrDie(tar_file, gzipped_tar_archive)
     current_date_str = datetime.datetime.now().strftime("%y%m%d")
-    ExtractAndRenameMembers(tar_file, "^tit.mrc$",
-                            name_prefix + "GesamtTiteldaten-" + current_date_str + ".mrc")
-    ExtractAndRenameMembers(tar_file, "^aut.mrc$", name_prefix + "Normdaten-" + current_date_str + ".mrc")
-
-    return [name_prefix + "GesamtTiteldaten-" + current_date_str + ".mrc",
-            name_prefix + "Normdaten-" + current_date_str + ".mrc"]
-
-
+    title_data_file_name = name_prefix + "GesamtTiteldaten-" + current_date_str + ".mrc"
+    norm_data_file_name = name_prefix + "Normdaten-" + current_date_str + ".mrc"
+
+    # The archive is read as a stream in a single pass, so each member is copied into its output file as soon as we
+    # reach it.  All members have to match our expectation as to what the BSZ should deliver.  Since we may only
+    # find out that they don't after some output has been written, we write to temporary files and only rename
+    # them once the whole archive has been processed.
+    title_data_temp_file_name = title_data_file_name + ".tmp"
+    norm_data_temp_file_name = norm_data_file_name + ".tmp"
+    member_counts = { _BSZ_TITLE_DATA_MEMBER_NAME : 0, _BSZ_NORM_DATA_MEMBER_NAME : 0 }
+    try:
+        with tarfile.open(gzipped_tar_archive, "r|gz", bufsize=COPY_BUFFER_SIZE) as tar_file, \
+             open(title_data_temp_file_name, "wb") as title_data_output, \
+             open(norm_data_temp_file_name, "wb") as norm_data_output:
+            for member in tar_file:
+                if member.name == _BSZ_TITLE_DATA_MEMBER_NAME:
+                    output = title_data_output
+                elif member.name == _BSZ_NORM_DATA_MEMBER_NAME:
+                    output = norm_data_output
+                elif not _BSZ_VALID_MEMBER_NAME_PATTERN.search(member.name):
+                    Error("unknown tar file member \"" + member.name + "\" in \"" + gzipped_tar_archive + "\"!")
+                else:
+                    continue
+                _CopyStream(tar_file.extractfile(member), output)
+                member_counts[member.name] += 1
+
+        for member_name, member_count in member_counts.items():
+            if member_count == 0:
+                Error("no \"" + member_name + "\" member in \"" + gzipped_tar_archive + "\"!")
+    except BaseException: # N.B. Error() raises SystemExit.
+        Remove(title_data_temp_file_name)
+        Remove(norm_data_temp_file_name)
+        raise
+
+    os.replace(title_data_temp_file_name, title_data_file_name)
+    os.replace(norm_data_temp_file_name, norm_data_file_name)
+    return [title_data_file_name, norm_data_file_name]
+
+
+# @note os.access() is only consulted for regular files with an execute bit set, so that the common case of a
+#       nonexistent candidate costs a single stat.
 def IsExecutableFile(executable_candidate):
-    return os.path.isfile(executable_candidate) and os.access(executable_candidate, os.X_OK)
+    try:
+        stat_buf = os.stat(executable_candidate)
+    except OSError:
+        return False
+    return (stat.S_ISREG(stat_buf.st_mode) and (stat_buf.st_mode & 0o111) != 0
+            and os.access(executable_candidate, os.X_OK))
 
 
 # Strips the path and an optional extension from "reference_file_name" and appends ".log"
@@ -347,21 +548,49 @@ def MakeLogFileName(reference_file_name, log_directory):
     return log_file_name
 
 # @return the most recent file matching "file_name_glob" or None if there were no matching files.
+# @note   Unless there are wildcards in the directory part of "file_name_glob", the directory is scanned with a single
+#         os.scandir() which yields the modification times without extra stat calls for most file systems.
 def getMostRecentFileMatchingGlob(file_name_glob):
+    directory, name_pattern = os.path.split(file_name_glob)
     most_recent_matching_name = None
     most_recent_mtime = None
-    for name in glob.glob(file_name_glob):
-        if not most_recent_matching_name:
-            most_recent_matching_name = name
-        else:
-            stat_buf = os.stat(name)
-            if most_recent_mtime is None or stat_buf.st_mtime > most_recent_mtime:
+
+    if glob.has_magic(directory):
+        for name in glob.iglob(file_name_glob):
+            try:
+                mtime = os.stat(name).st_mtime
+            except OSError: # E.g. a dangling symlink.
+                continue
+            if most_recent_mtime is None or mtime > most_recent_mtime:
                 most_recent_matching_name = name
-                most_recent_mtime = stat_buf.st_mtime
+                most_recent_mtime = mtime
+        return most_recent_matching_name
+
+    compiled_pattern = re.compile(fnmatch.translate(name_pattern))
+    include_hidden_files = name_pattern.startswith(".") # Same as glob.glob().
+    try:
+        entries = os.scandir(directory if directory else ".")
+    except OSError:
+        return None
+    with entries:
+        for entry in entries:
+            if not compiled_pattern.match(entry.name) or (entry.name.startswith(".") and not include_hidden_files):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError: # E.g. a dangling symlink.
+                continue
+            if most_recent_mtime is None or mtime > most_recent_mtime:
+                most_recent_matching_name = os.path.join(directory, entry.name)
+                most_recent_mtime = mtime
 
     return most_recent_matching_name
 
 
+# The level 9 default of tarfile is several times slower than level 1 while yielding only slightly smaller tarballs.
+TARBALL_COMPRESSION_LEVEL = 1
+
+
 # @brief Stores a list of files in a tarball
 # @param tar_file_name       The name of the archive that will be created.  If the name ends with "gz" or "bz" the
 #                            appropriate compression method will be applied.
@@ -376,15 +605,15 @@ def CreateTarball(tar_file_name, list_of_members, overwrite=False, delete_input_
         Error("tarball \"" + tar_file_name + "\" already exists!")
 
     if tar_file_name.endswith("gz"):
-        mode = "w:gz"
+        new_tarfile = tarfile.open(name=tar_file_name, mode="w:gz", compresslevel=TARBALL_COMPRESSION_LEVEL)
     elif tar_file_name.endswith("bz"):
-        mode = "w:bz"
+        new_tarfile = tarfile.open(name=tar_file_name, mode="w:bz2", compresslevel=TARBALL_COMPRESSION_LEVEL)
     else:
-        mode = "w"
+        new_tarfile = tarfile.open(name=tar_file_name, mode="w")
 
-    new_tarfile = tarfile.open(name=tar_file_name, mode=mode)
-    for file_and_member_names in list_of_members:
-        new_tarfile.add(name=os.path.realpath(file_and_member_names[0]), arcname=file_and_member_names[1])
+    with new_tarfile:
+        for file_and_member_names in list_of_members:
+            new_tarfile.add(name=os.path.realpath(file_and_member_names[0]), arcname=file_and_member_names[1])
 
     if not delete_input_files:
         return
@@ -404,12 +633,11 @@ def RemoveLinkTargetAndLink(link_name, fail_on_dangling=False):
     if not os.path.islink(link_name):
         Error("in util.RemoveLinkTargetAndLink: \"" + link_name + "\" is not a symlink!")
     try:
-        link_target = os.readlink(link_name)
-        ctypes.set_errno(0)
-        os.unlink(link_target)
-    except Exception:
-        if not fail_on_dangling or ctypes.get_errno() != errno.ENOENT:
-            Error("in util.RemoveLinkTargetAndLink: can't delete link target of \"" + link_name + "\"!")
+        os.unlink(ResolveSymlink(link_name))
+    except OSError as e:
+        if fail_on_dangling or e.errno != errno.ENOENT:
+            Error("in util.RemoveLinkTargetAndLink: can't delete link target of \"" + link_name + "\"! ("
+                  + str(e) + ")")
     os.unlink(link_name)
 
 
@@ -429,28 +657,33 @@ def Touch(filename, times=None):
         os.utime(filename, times)
 
 
-def ExecOrDie(cmd_name, args, log_file_name=None, setsid=True):
+# @param cwd  If not None, the working directory of the child process.
+def ExecOrDie(cmd_name, args, log_file_name=None, setsid=True, cwd=None):
     if log_file_name is None:
         log_file_name = "/proc/self/fd/2" # stderr
     if not process_util.Exec(cmd_path=cmd_name, args=args, new_stdout=log_file_name,
-                             new_stderr=log_file_name, append_stdout=True, append_stderr=True, setsid=setsid) == 0:
+                             new_stderr=log_file_name, append_stdout=True, append_stderr=True, setsid=setsid,
+                             cwd=cwd) == 0:
         SendEmail("util.ExecOrDie", "Failed to execute \"" + cmd_name + "\".\nSee logfile \"" + log_file_name
                   + "\" for the reason.", priority=1)
         sys.exit(-1)
 
 
+@functools.lru_cache(maxsize=None)
+def _WhichInPath(executable_name, path):
+    return shutil.which(executable_name, path=path) or ""
+
+
 # @brief Looks for "executable_name" in $PATH unless it contains a slash.
 # @return Either the path to an executable program or the empty string.
+# @note  Lookups are cached per value of $PATH.
 def Which(executable_name):
     if '/' in executable_name:
         return executable_name if os.access(executable_name, os.X_OK) else ""
     path = os.getenv("PATH")
-    if path is None:
+    if not path:
         return ""
-    for path_component in path.split(':'):
-        if os.access(path_component + "/" + executable_name, os.X_OK):
-            return path_component + "/" + executable_name
-    return ""
+    return _WhichInPath(executable_name, path)
 
 
 # Returns the last "max_no_of_lines" of "filename" or the contents of the entire file if the file contains no more than
@@ -458,25 +691,31 @@ def Which(executable_name):
 # @return The requested lines.
 def Tail(filename, max_no_of_lines):
     with open(filename, "rb") as f:
-        map = mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ)
-
-        map.seek(0, os.SEEK_END)
-        no_of_lines = 0
-        requested_lines = bytearray()
-        while map.tell() != 0:
-            cur_pos = map.tell()
-            map.seek(cur_pos - 1)
-            previous_byte = map.read_byte()
-            if previous_byte == '\n':
-                no_of_lines += 1
-                if no_of_lines == max_no_of_lines + 1:
-                    return str(requested_lines[::-1])
-            map.seek(cur_pos - 1)
-            requested_lines += previous_byte
-
-        map.close()
-        return str(requested_lines[::-1])
-
-
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ) as map:
+            # A trailing newline terminates the last line and does not start a new one.
+            search_end = size - 1 if map[size - 1] == ord('\n') else size
+            start_pos = size
+            for _ in range(max_no_of_lines):
+                newline_pos = map.rfind(b'\n', 0, search_end)
+                if newline_pos == -1:
+                    start_pos = 0
+                    break
+                start_pos = newline_pos + 1
+                search_end = newline_pos
+            return map[start_pos:size].decode("utf-8", "replace")
+
+
+# @note Like "mv --force", "new_path" may be an existing directory and the two paths may be on different file systems.
 def RenameFile(old_path : str, new_path : str) -> None:
-    ExecOrDie("/bin/mv", [ "--force", old_path, new_path ])
+    try:
+        try:
+            os.replace(old_path, new_path)
+        except IsADirectoryError:
+            os.replace(old_path, os.path.join(new_path, os.path.basename(old_path)))
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            Error("in util.RenameFile: failed to rename \"" + old_path + "\" to \"" + new_path + "\"! (" + str(e) + ")")
+        shutil.move(old_path, new_path)
@@ -1,41 +1,48 @@
 #!/bin/python3
 # -*- coding: utf-8 -*-
-import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 import stdnum.issn as issn_checker
-import urllib.request
+import time
 import github_api_util
 import zotero_harvester_util
 
 
 ZOTERO_JOURNAL_STATUS_REPO = 'zotero-journal-status'
 NO_KNOWN_ISSN = 'No known ISSN'
-
-
-class EntryPresent(Exception):
-    pass
+# Kept low since GitHub's secondary rate limits punish bursts of content-creating requests.
+MAX_CONCURRENT_ISSUE_CREATIONS = 4
 
 
 def CreateIssueInZoteroJournalStatus(data):
     if not 'GITHUB_OAUTH_TOKEN' in os.environ:
        raise Exception('GITHUB_OAUTH_TOKEN must be set. Export it from the shell')
     github_oauth_token = os.environ.get('GITHUB_OAUTH_TOKEN')
-    jsondata = json.dumps(data)
-    bindata = jsondata.encode('utf-8')
-    req = urllib.request.Request('https://api.github.com/repos/ubtue/' + ZOTERO_JOURNAL_STATUS_REPO + '/issues')
-    req.add_header('Content-Type', 'application/json')
-    req.add_header('Authorization', 'token ' + github_oauth_token)
-    req.add_header('Content-Length', len(bindata))
-    response = urllib.request.urlopen(req, bindata)
-    print(response.read().decode('utf-8'))
+    headers = { 'Authorization' : 'token ' + github_oauth_token }
+    url = 'https://api.github.com/repos/ubtue/' + ZOTERO_JOURNAL_STATUS_REPO + '/issues'
+    response = github_api_util.GetSessionForNonIdempotentRequests().post(url, json=data, headers=headers,
+                                                                         timeout=github_api_util.GITHUB_API_TIMEOUT)
+    response.raise_for_status()
+    print(response.text)
+    # Once the rate limit is exhausted, hold this worker back until it is reset:
+    if response.headers.get('X-RateLimit-Remaining') == '0' and 'X-RateLimit-Reset' in response.headers:
+        time.sleep(max(0, int(response.headers['X-RateLimit-Reset']) - time.time()))
 
 
 def CreateNewZoteroJournalStatusIssues():
     journal_types = [ "IxTheo", "KrimDok" ]
     zeder_titles = {}
+    queued_issns = {} # ISSN => section, so that sections sharing an ISSN don't result in duplicate issues.
     zotero_group = "zotero_group"
     config = zotero_harvester_util.GetZoteroConfiguration()
     github_existing_issues = github_api_util.GetAllIssuesForUBTueRepository(ZOTERO_JOURNAL_STATUS_REPO)
+    # Issue titles have the form "<issn> | <section>".
+    existing_issns = set()
+    existing_sections = set()
+    for issue in github_existing_issues:
+        title_issn, _, title_section = issue['title'].partition(' | ')
+        existing_issns.add(title_issn.strip())
+        existing_sections.add(title_section.strip())
     for section in config.sections():
         if config.has_option(section, zotero_group) and config.get(section, zotero_group) in journal_types:
             issn = NO_KNOWN_ISSN
@@ -45,20 +52,30 @@ def CreateNewZoteroJournalStatusIssues():
                 issn = config.get(section, "print_issn")
             #Filter garbage
             issn = issn if issn_checker.is_valid(issn) else NO_KNOWN_ISSN
-            try:
-                for issue in github_existing_issues:
-                    if issn != NO_KNOWN_ISSN:
-                        if issue['title'].find(issn) != -1:
-                            raise EntryPresent()
-                    else:
-                        if issue['title'].find(section) != -1:
-                            raise EntryPresent()
-            except EntryPresent:
+            if issn != NO_KNOWN_ISSN:
+                if issn in existing_issns:
+                    continue
+                if issn in queued_issns:
+                    print("Warning: not creating an issue for \"" + section + "\" since its ISSN " + issn
+                          + " was already queued for \"" + queued_issns[issn] + "\"")
+                    continue
+                queued_issns[issn] = section
+            elif section in existing_sections:
                 continue
             zeder_titles.update({ issn + ' | ' + section : config.get(section, zotero_group) })
-    for issue_title in zeder_titles:
-        data = { "title" : issue_title, "labels" : [ zeder_titles[issue_title], "Untested" ] }
-        CreateIssueInZoteroJournalStatus(data)
+    failed_titles = []
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_ISSUE_CREATIONS) as executor:
+        futures = { executor.submit(CreateIssueInZoteroJournalStatus,
+                                    { "title" : issue_title, "labels" : [ zeder_titles[issue_title], "Untested" ] }) :
+                    issue_title for issue_title in zeder_titles }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print("Failed to create issue \"" + futures[future] + "\": " + str(e))
+                failed_titles.append(futures[future])
+    if failed_titles:
+        raise Exception('Failed to create ' + str(len(failed_titles)) + ' issue(s): ' + ', '.join(failed_titles))
 
 
 def Main():
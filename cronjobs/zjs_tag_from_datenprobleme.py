@@ -21,41 +21,51 @@ def ExtractOpenAndClosedWithoutOpenISSNs(issues):
     return open_issues_issns, closed_without_open_issues_issns
 
 
-def UpdateZoteroJournalStatus(issue, labels_to_add, issn):
+# Appends the update for "issue", if any, to "pending_updates", cf. github_api_util.BatchUpdateIssuesInRepository().
+def UpdateZoteroJournalStatus(issue, labels_to_add, issn, pending_updates):
     if len(labels_to_add) == 0:
         return
 
-    encoded_issn = urllib.parse.quote(issn)
     if github_ubtue_util.HAS_ISSUE_LABEL in labels_to_add:
-        new_labels = github_ubtue_util.AdjustZoteroStatusLabels(issue, labels_to_add, [ github_ubtue_util.UNTESTED_LABEL, github_ubtue_util.NO_OPEN_ISSUE_LABEL ]);
-        data = { "labels" : new_labels, "body" : "[Open issues](https://github.com/ubtue/DatenProbleme/issues?q=is%3Aissue+is%3Aopen+" \
-                                                   + encoded_issn + "+in%3Atitle+) " + \
-                                                 "[All Issues](https://github.com/ubtue/DatenProbleme/issues?q=is%3Aissue+" \
-                                                   + encoded_issn + "+in%3Atitle+)" }
+        labels_to_remove = [ github_ubtue_util.UNTESTED_LABEL, github_ubtue_util.NO_OPEN_ISSUE_LABEL ]
     elif github_ubtue_util.NO_OPEN_ISSUE_LABEL in labels_to_add:
-        new_labels = github_ubtue_util.AdjustZoteroStatusLabels(issue, labels_to_add, [ github_ubtue_util.UNTESTED_LABEL, github_ubtue_util.HAS_ISSUE_LABEL ]);
-        data = { "labels" : new_labels, "body" : "[Closed issues](https://github.com/ubtue/DatenProbleme/issues?q=is%3Aissue+is%3Aclosed+" \
-                                                   + encoded_issn + "+in%3Atitle+)" }
+        labels_to_remove = [ github_ubtue_util.UNTESTED_LABEL, github_ubtue_util.HAS_ISSUE_LABEL ]
     else:
-        data = { "labels" : new_labels }
-    issue_number = str(issue['number'])
-    if not github_ubtue_util.LabelsAreIdentical(issue, new_labels):
-       github_api_util.UpdateIssueInRepository('zotero-journal-status', issue_number, data)
+        labels_to_remove = []
+    new_labels = github_ubtue_util.AdjustZoteroStatusLabels(issue, labels_to_add, labels_to_remove)
+    if github_ubtue_util.LabelsAreIdentical(issue, new_labels):
+        return
+
+    data = { "labels" : new_labels }
+    encoded_issn = urllib.parse.quote(issn)
+    if github_ubtue_util.HAS_ISSUE_LABEL in labels_to_add:
+        data["body"] = "[Open issues](https://github.com/ubtue/DatenProbleme/issues?q=is%3Aissue+is%3Aopen+" \
+                       + encoded_issn + "+in%3Atitle+) " + \
+                       "[All Issues](https://github.com/ubtue/DatenProbleme/issues?q=is%3Aissue+" \
+                       + encoded_issn + "+in%3Atitle+)"
+    elif github_ubtue_util.NO_OPEN_ISSUE_LABEL in labels_to_add:
+        data["body"] = "[Closed issues](https://github.com/ubtue/DatenProbleme/issues?q=is%3Aissue+is%3Aclosed+" \
+                       + encoded_issn + "+in%3Atitle+)"
+    pending_updates.append((issue, data))
 
 
-def TagZoteroJournalStatusFromDatenProbleme():
+# @param zotero_journal_status_issues  The issues of zotero-journal-status if already retrieved by the caller.
+def TagZoteroJournalStatusFromDatenProbleme(zotero_journal_status_issues=None):
     datenprobleme_issues = github_api_util.GetAllIssuesForUBTueRepository("Datenprobleme")
-    zotero_journal_status_issues = github_api_util.GetAllIssuesForUBTueRepository("zotero-journal-status")
+    if zotero_journal_status_issues is None:
+        zotero_journal_status_issues = github_api_util.GetAllIssuesForUBTueRepository("zotero-journal-status")
     datenprobleme_open_issns, datenprobleme_closed_without_open_issues_issns = ExtractOpenAndClosedWithoutOpenISSNs(datenprobleme_issues)
+    issn_matcher = github_api_util.GetISSNMatcher()
+    pending_updates = []
     for issue in zotero_journal_status_issues:
-        issn_matcher = github_api_util.GetISSNMatcher()
         issns = issn_matcher.findall(issue['title'])
         if len(issns):
             for issn in issns:
                 if issn in datenprobleme_open_issns:
-                    UpdateZoteroJournalStatus(issue, [ github_ubtue_util.HAS_ISSUE_LABEL ], issn)
+                    UpdateZoteroJournalStatus(issue, [ github_ubtue_util.HAS_ISSUE_LABEL ], issn, pending_updates)
                 elif issn in datenprobleme_closed_without_open_issues_issns:
-                    UpdateZoteroJournalStatus(issue, [ github_ubtue_util.NO_OPEN_ISSUE_LABEL ], issn)
+                    UpdateZoteroJournalStatus(issue, [ github_ubtue_util.NO_OPEN_ISSUE_LABEL ], issn, pending_updates)
+    github_api_util.BatchUpdateIssuesInRepository('zotero-journal-status', pending_updates)
 
 
 def Main():
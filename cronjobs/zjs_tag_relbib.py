@@ -6,27 +6,34 @@ import zotero_harvester_util
 
 ZOTERO_JOURNAL_STATUS_REPO = 'zotero-journal-status'
 
-def GetSSGNStatusFromConfig(config, issn):
+# @return A map from the online and print ISSNs of all IxTheo journals to their "ssgn" value or False if
+#         the journal has none.  If an ISSN occurs in several sections the first one wins.
+def BuildIxTheoISSNtoSSGN(config):
     zotero_group = "zotero_group"
+    issn_to_ssgn = {}
     for section in config.sections():
-       if config.has_option(section, zotero_group) and config.get(section, zotero_group) in ["IxTheo"]:
-           if config.has_option(section, "online_issn") and config.get(section, "online_issn") == issn  \
-               or config.has_option(section, "print_issn") and config.get(section, "print_issn") == issn:
-                   if not config.has_option(section, "ssgn"):
-                       return False
-                   return config.get(section, "ssgn")
-           
+        if not config.has_option(section, zotero_group) or config.get(section, zotero_group) not in ["IxTheo"]:
+            continue
+        ssgn = config.get(section, "ssgn") if config.has_option(section, "ssgn") else False
+        for issn_option in [ "online_issn", "print_issn" ]:
+            if config.has_option(section, issn_option):
+                issn_to_ssgn.setdefault(config.get(section, issn_option), ssgn)
+    return issn_to_ssgn
 
 
-def TagRelbibJournalsFromZoteroHarvesterConf():
+# @param zotero_journal_status_issues  The issues of zotero-journal-status if already retrieved by the caller.
+def TagRelbibJournalsFromZoteroHarvesterConf(zotero_journal_status_issues=None):
     config = zotero_harvester_util.GetZoteroConfiguration()
-    zotero_journal_status_issues = github_api_util.GetAllIssuesForUBTueRepository(ZOTERO_JOURNAL_STATUS_REPO)
+    if zotero_journal_status_issues is None:
+        zotero_journal_status_issues = github_api_util.GetAllIssuesForUBTueRepository(ZOTERO_JOURNAL_STATUS_REPO)
+    issn_matcher = github_api_util.GetISSNMatcher()
+    issn_to_ssgn = BuildIxTheoISSNtoSSGN(config)
+    pending_updates = []
     for issue in zotero_journal_status_issues:
-        issn_matcher = github_api_util.GetISSNMatcher()
         issns = issn_matcher.findall(issue['title'])
         if len(issns):
             for issn in issns:
-                ssgn = GetSSGNStatusFromConfig(config, issn)
+                ssgn = issn_to_ssgn.get(issn)
                 has_relbib_ssgn = False
                 if ssgn == "FG_0":
                     new_labels = github_ubtue_util.AdjustZoteroStatusLabels(
@@ -41,9 +48,8 @@ def TagRelbibJournalsFromZoteroHarvesterConf():
                     has_relbib_ssgn = True
                     break;
             if has_relbib_ssgn and not github_ubtue_util.LabelsAreIdentical(issue, new_labels):
-               issue_number = str(issue['number'])
-               data = { "labels" : new_labels }
-               github_api_util.UpdateIssueInRepository('zotero-journal-status', issue_number, data)
+               pending_updates.append((issue, { "labels" : new_labels }))
+    github_api_util.BatchUpdateIssuesInRepository(ZOTERO_JOURNAL_STATUS_REPO, pending_updates)
 
 
 def Main():
@@ -41,52 +41,54 @@ def GetZederZotatNumberCode(zeder_instance):
     return "Unknown"
 
 
-def GetZederZotAutStatusForISSN(issn, zeder_instances):
-    for zeder_instance in zeder_instances:
-        zota_number_code = GetZederZotaNumberCode(zeder_instance) # We have different number codes for zota depending on the instance
-        if zota_number_code == "Unknown":
-            raise Exception("Could not determine Id for Zeder zota")
-        for item in zeder_instance['daten']:
-             if 'essn' in item and item['essn'].strip() == issn:
-                 if HasZotAut(item, zota_number_code):
-                     return True
-             elif 'issn' in item and item['issn'].strip() == issn:
-                 if  HasZotAut(item, zota_number_code):
-                     return True
-    return False
-
-
-def GetZederZotTestStatusForISSN(issn, zeder_instances):
-    for zeder_instance in zeder_instances:
-        zotat_number_code = GetZederZotatNumberCode(zeder_instance) # We have different number codes for zotat depending on the instance
-        if zotat_number_code == "Unknown":
-            raise Exception("Could not determine Id for Zeder zotat")
-        for item in zeder_instance['daten']:
-             if 'essn' in item and item['essn'].strip() == issn:
-                 if HasZotTest(item, zotat_number_code):
-                     return True
-             elif 'issn' in item and item['issn'].strip() == issn:
-                 if  HasZotTest(item, zotat_number_code):
-                     return True
-    return False
-
-
-
-def TagZoteroJournalDeliveryStatusFromZeder():
-    ixtheo_zeder = GetDataFromZeder(ZEDER_URL_IXTHEO)
-    krimdok_zeder = GetDataFromZeder(ZEDER_URL_KRIMDOK)
-    zotero_journal_status_issues = github_api_util.GetAllIssuesForUBTueRepository("zotero-journal-status")
+# @return A dict that maps every ISSN of "zeder_instance" to a pair of flags: (has zota, has zotat).
+def GetZederISSNIndex(zeder_instance):
+    # We have different number codes for zota and zotat depending on the instance
+    zota_number_code = GetZederZotaNumberCode(zeder_instance)
+    if zota_number_code == "Unknown":
+        raise Exception("Could not determine Id for Zeder zota")
+    zotat_number_code = GetZederZotatNumberCode(zeder_instance)
+    if zotat_number_code == "Unknown":
+        raise Exception("Could not determine Id for Zeder zotat")
+
+    issn_index = {}
+    for item in zeder_instance['daten']:
+        has_zot_aut = HasZotAut(item, zota_number_code)
+        has_zot_test = HasZotTest(item, zotat_number_code)
+        for issn_key in [ 'essn', 'issn' ]:
+            if issn_key in item:
+                issn = item[issn_key].strip()
+                zot_aut, zot_test = issn_index.get(issn, (False, False))
+                issn_index[issn] = (zot_aut or has_zot_aut, zot_test or has_zot_test)
+    return issn_index
+
+
+def GetZederZotAutStatusForISSN(issn, zeder_issn_indices):
+    return any(issn_index.get(issn, (False, False))[0] for issn_index in zeder_issn_indices)
+
+
+def GetZederZotTestStatusForISSN(issn, zeder_issn_indices):
+    return any(issn_index.get(issn, (False, False))[1] for issn_index in zeder_issn_indices)
+
+
+# @param zotero_journal_status_issues  The issues of zotero-journal-status if already retrieved by the caller.
+def TagZoteroJournalDeliveryStatusFromZeder(zotero_journal_status_issues=None):
+    zeder_issn_indices = [ GetZederISSNIndex(GetDataFromZeder(ZEDER_URL_IXTHEO)),
+                           GetZederISSNIndex(GetDataFromZeder(ZEDER_URL_KRIMDOK)) ]
+    if zotero_journal_status_issues is None:
+        zotero_journal_status_issues = github_api_util.GetAllIssuesForUBTueRepository("zotero-journal-status")
+    issn_matcher = github_api_util.GetISSNMatcher()
+    pending_updates = []
     for issue in zotero_journal_status_issues:
-        issn_matcher = github_api_util.GetISSNMatcher()
         issns = issn_matcher.findall(issue['title'])
         zotaut_status = False
         zottest_status = False
         if len(issns):
             for issn in issns:
-                zotaut_status = GetZederZotAutStatusForISSN(issn, [ixtheo_zeder, krimdok_zeder])
+                zotaut_status = GetZederZotAutStatusForISSN(issn, zeder_issn_indices)
                 if zotaut_status:
                     break
-                zottest_status = GetZederZotTestStatusForISSN(issn, [ixtheo_zeder, krimdok_zeder])
+                zottest_status = GetZederZotTestStatusForISSN(issn, zeder_issn_indices)
                 if zottest_status:
                     break
         if zotaut_status:
@@ -94,26 +96,20 @@ def TagZoteroJournalDeliveryStatusFromZeder():
                              [ github_ubtue_util.READY_FOR_PRODUCTION_LABEL, github_ubtue_util.BSZ_LABEL,
                                github_ubtue_util.UNTESTED_LABEL ])
             if not github_ubtue_util.LabelsAreIdentical(issue, new_labels):
-                issue_number = str(issue['number'])
-                data = { "labels" : new_labels }
-                github_api_util.UpdateIssueInRepository('zotero-journal-status', issue_number, data)
+                pending_updates.append((issue, { "labels" : new_labels }))
             continue
         if zottest_status:
             new_labels = github_ubtue_util.AdjustZoteroStatusLabels(issue, [ github_ubtue_util.BSZ_LABEL ],
                              [github_ubtue_util.ZOTAUT_LABEL, github_ubtue_util.UNTESTED_LABEL])
             if not github_ubtue_util.LabelsAreIdentical(issue, new_labels):
-                issue_number = str(issue['number'])
-                data = { "labels" : new_labels }
-                github_api_util.UpdateIssueInRepository('zotero-journal-status', issue_number, data)
+                pending_updates.append((issue, { "labels" : new_labels }))
             continue
         else:
             new_labels = github_ubtue_util.AdjustZoteroStatusLabels(issue, [],
                              [github_ubtue_util.ZOTAUT_LABEL, github_ubtue_util.BSZ_LABEL])
             if not github_ubtue_util.LabelsAreIdentical(issue, new_labels):
-                issue_number = str(issue['number'])
-                data = { "labels" : new_labels }
-                github_api_util.UpdateIssueInRepository('zotero-journal-status', issue_number, data)
-
+                pending_updates.append((issue, { "labels" : new_labels }))
+    github_api_util.BatchUpdateIssuesInRepository('zotero-journal-status', pending_updates)
 
 
 def Main():
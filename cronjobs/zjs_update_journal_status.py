@@ -12,9 +12,12 @@ import zjs_tag_relbib
 def Main():
     github_api_util.ExportPersonalAuthenticationToken()
     zjs_create_issues.CreateNewZoteroJournalStatusIssues()
-    zjs_tag_from_datenprobleme.TagZoteroJournalStatusFromDatenProbleme()
-    zjs_tag_zotaut.TagZoteroJournalDeliveryStatusFromZeder()
-    zjs_tag_relbib.TagRelbibJournalsFromZoteroHarvesterConf()
+    # Retrieved only after the new issues have been created and shared by all taggers.  N.B. the taggers see each
+    # other's label changes since BatchUpdateIssuesInRepository() applies them to the retrieved issues as well.
+    zotero_journal_status_issues = github_api_util.GetAllIssuesForUBTueRepository("zotero-journal-status")
+    zjs_tag_from_datenprobleme.TagZoteroJournalStatusFromDatenProbleme(zotero_journal_status_issues)
+    zjs_tag_zotaut.TagZoteroJournalDeliveryStatusFromZeder(zotero_journal_status_issues)
+    zjs_tag_relbib.TagRelbibJournalsFromZoteroHarvesterConf(zotero_journal_status_issues)
     util.SendEmail("ZJS Update Journal Status", "Successfully updated zotero-journal-status")
 
 
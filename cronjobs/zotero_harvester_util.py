@@ -1,17 +1,15 @@
 #!/bin/python3
 # -*- coding: utf-8 -*-
 import configparser
+import functools
 
 
+# N.B. the result is cached, callers must not modify the returned configuration.
+@functools.lru_cache(maxsize=1)
 def GetZoteroConfiguration():
     zotero_harvester_conf_path = "/usr/local/var/lib/tuelib/zotero-enhancement-maps/zotero_harvester.conf"
-    zotero_harvester_conf_tmp_path = "/tmp/zotero_harvester.conf"
     # Section at the beginning needed for configparser
-    with open(zotero_harvester_conf_path, "r") as zotero_harvester_conf, \
-         open(zotero_harvester_conf_tmp_path, "w") as zotero_harvester_tmp_conf:
-            zotero_harvester_tmp_conf.write("[DEFAULT]\n")
-            zotero_harvester_tmp_conf.write(zotero_harvester_conf.read())
-    config = configparser.ConfigParser()
-    config.read(zotero_harvester_conf_tmp_path)
+    with open(zotero_harvester_conf_path, "r") as zotero_harvester_conf:
+        config = configparser.ConfigParser()
+        config.read_string("[DEFAULT]\n" + zotero_harvester_conf.read(), source=zotero_harvester_conf_path)
     return config
-